@@ -3,14 +3,244 @@ ETL Pipeline for Production Line Data Integration - VERSION CORRIGÉE
 """
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+import os
+import re
 import sqlite3
+import codecs
+import csv
+from dataclasses import dataclass, fields
 from datetime import datetime, timedelta
+from typing import Optional
+
+
+# Les capteurs ne dépassent pas ±0.1 de précision: float32 suffit
+MEASUREMENT_DTYPE = 'float32'
+
+# Codes d'erreur capteurs et niveaux de qualité (codes uint8)
+ERROR_CODES = (-999, -1)
+DATA_QUALITY_LEVELS = ('good', 'estimated', 'invalid')
+QUALITY_GOOD, QUALITY_ESTIMATED, QUALITY_INVALID = range(len(DATA_QUALITY_LEVELS))
+QUALITY_STATUS_LEVELS = ('pass', 'fail', 'not_checked')
+STATUS_PASS, STATUS_FAIL, STATUS_NOT_CHECKED = range(len(QUALITY_STATUS_LEVELS))
+
+# Taille des blocs CSV: parsing multithread (lecture complète) et lots du streaming
+READ_BLOCK_SIZE = 8 << 20
+CHUNK_BLOCK_SIZE = 32 << 20
+
+# Format attendu des timestamps (détecté sur le premier échantillon non nul)
+TS_FORMAT = '%Y-%m-%d %H:%M:%S'
+TS_CACHE_MIN_ROWS = 1000
+
+# Écart maximal entre une lecture capteur et le contrôle qualité associé
+JOIN_TOLERANCE = pd.Timedelta('5min')
+# Préfixe des colonnes qualité dans la table jointe (ignorées par classify_column)
+QUALITY_PREFIX = 'qc_'
+
+
+# ============================================================================
+# COLUMN DETECTION
+# ============================================================================
+
+# Mot-clé (sous-chaîne du nom de colonne) -> rôle, testés dans cet ordre
+COLUMN_ROLES = {
+    'time': 'timestamp',
+    'date': 'timestamp',
+    'line': 'line',
+    'machine': 'machine',
+    'temp': 'temperature',
+    'press': 'pressure',
+    'vibr': 'vibration',
+    'power': 'power',
+    'result': 'result',
+    'defect': 'defect',
+    'fault': 'defect',
+    'status': 'status',
+}
+SENSOR_ROLES = ('temperature', 'pressure', 'vibration', 'power')
+# Rôles des colonnes réellement lues par le pipeline dans chaque fichier
+SENSOR_READ_ROLES = ('timestamp', 'line', 'machine') + SENSOR_ROLES
+QUALITY_READ_ROLES = ('timestamp', 'line', 'machine', 'result', 'defect', 'status')
+# Un seul passage par nom de colonne au lieu d'un test 'xxx' in col.lower() par mot-clé
+_COL_RE = re.compile('|'.join(COLUMN_ROLES), re.IGNORECASE)
+
+
+def classify_column(col):
+    """Return the role of a column from its name, or None."""
+    if 'quality' in col.lower() or col.lower().startswith(QUALITY_PREFIX):
+        return None
+    match = _COL_RE.search(col)
+    return COLUMN_ROLES[match.group().lower()] if match else None
+
+
+@dataclass
+class ColumnMap:
+    """Column name playing each role in a DataFrame (first match wins)."""
+    timestamp: Optional[str] = None
+    line: Optional[str] = None
+    machine: Optional[str] = None
+    temperature: Optional[str] = None
+    pressure: Optional[str] = None
+    vibration: Optional[str] = None
+    power: Optional[str] = None
+    result: Optional[str] = None
+    defect: Optional[str] = None
+    status: Optional[str] = None
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Classify every column once."""
+        roles = {}
+        for col in columns:
+            role = classify_column(col)
+            if role is not None and role not in roles:
+                roles[role] = col
+        return cls(**roles)
+
+    def sensors(self):
+        """Sensor role -> column name, for the sensors present."""
+        return {role: getattr(self, role) for role in SENSOR_ROLES if getattr(self, role)}
+
+    def rename_map(self, targets):
+        """Column name -> database column name, for the roles present."""
+        return {getattr(self, f.name): targets[f.name] for f in fields(self)
+                if f.name in targets and getattr(self, f.name)}
 
 
 # ============================================================================
 # PHASE 1: EXTRACT
 # ============================================================================
 
+def _arrow_csv_options(file_path, roles, encoding='utf-8', block_size=READ_BLOCK_SIZE):
+    """Build pyarrow CSV options reading only the header columns playing one of roles."""
+    # utf-8-sig: un BOM éventuel ne doit pas coller au premier nom de colonne
+    # (pyarrow le retire lui-même des noms qu'il lit)
+    header_encoding = 'utf-8-sig' if codecs.lookup(encoding).name == 'utf-8' else encoding
+    with open(file_path, newline='', encoding=header_encoding) as f:
+        header = next(csv.reader(f), [])
+
+    header_roles = {col: classify_column(col) for col in header}
+    usecols = [col for col in header if header_roles[col] in roles]
+    measurement_type = pa.from_numpy_dtype(np.dtype(MEASUREMENT_DTYPE))
+    column_types = {col: measurement_type for col in usecols if header_roles[col] in SENSOR_ROLES}
+    # Identifiants machine/ligne toujours en texte: un 'M7' après des ids numériques
+    # ne doit pas devenir NaN (ni changer le dtype de la colonne d'un lot à l'autre)
+    column_types.update({col: pa.string() for col in usecols if header_roles[col] in ('machine', 'line')})
+
+    read_options = pacsv.ReadOptions(use_threads=True, block_size=block_size, encoding=encoding)
+    convert_options = pacsv.ConvertOptions(
+        include_columns=usecols,
+        column_types=column_types,
+        strings_can_be_null=True,
+        timestamp_parsers=[TS_FORMAT, pacsv.ISO8601]
+    )
+    return read_options, convert_options
+
+
+def _infer_csv_schema(file_path, read_options, convert_options):
+    """Column types inferred by pyarrow on the first block (measurements forced to float32)."""
+    forced_types = convert_options.column_types
+    probe_options = pacsv.ConvertOptions(
+        include_columns=convert_options.include_columns,
+        strings_can_be_null=True,
+        timestamp_parsers=convert_options.timestamp_parsers
+    )
+    with pa.memory_map(file_path) as source:
+        schema = pacsv.open_csv(source, read_options=read_options, convert_options=probe_options).schema
+
+    # Colonne vide dans le premier bloc (type null): garder le texte
+    return pa.schema([
+        pa.field(f.name, forced_types.get(f.name, pa.string() if pa.types.is_null(f.type) else f.type))
+        for f in schema
+    ])
+
+
+def _text_convert_options(convert_options):
+    """Same columns, all read as text: types are applied per batch by _cast_text_batch."""
+    return pacsv.ConvertOptions(
+        include_columns=convert_options.include_columns,
+        column_types={col: pa.string() for col in convert_options.include_columns},
+        strings_can_be_null=True
+    )
+
+
+def _cast_text_batch(record_batch, schema):
+    """
+    Cast a batch read as text to the inferred schema.
+
+    pyarrow n'infère les types que sur le premier bloc: une valeur non conforme plus loin
+    ('not a date', 'n/a') ferait échouer toute la lecture. Pour les colonnes timestamp et
+    mesures, la colonne du lot concerné passe par pandas avec errors='coerce' et la valeur
+    devient nulle; les autres colonnes de ce lot restent en texte.
+    """
+    arrays = []
+    for field in schema:
+        column = record_batch.column(field.name)
+        if column.type == field.type:
+            arrays.append(column)
+            continue
+        try:
+            arrays.append(column.cast(field.type))
+            continue
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            pass
+
+        if classify_column(field.name) not in ('timestamp',) + SENSOR_ROLES:
+            arrays.append(column)
+            continue
+        values = column.to_pandas()
+        if pa.types.is_temporal(field.type):
+            values = _parse_timestamps(values)
+        elif pa.types.is_integer(field.type) or pa.types.is_floating(field.type):
+            values = pd.to_numeric(values, errors='coerce')
+        column = pa.array(values, from_pandas=True)
+        try:
+            column = column.cast(field.type)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            pass  # ex: décimaux dans une colonne entière -> reste en float pour ce lot
+        arrays.append(column)
+    return pa.RecordBatch.from_arrays(arrays, names=schema.names)
+
+
+def _read_csv_table(file_path, roles, encoding='utf-8'):
+    """Read only the columns playing one of roles with pyarrow's multithreaded CSV reader."""
+    read_options, convert_options = _arrow_csv_options(file_path, roles, encoding)
+    schema = _infer_csv_schema(file_path, read_options, convert_options)
+    with pa.memory_map(file_path) as source:
+        table = pacsv.read_csv(source, read_options=read_options,
+                               convert_options=_text_convert_options(convert_options))
+    return pa.Table.from_batches([_cast_text_batch(batch, schema) for batch in table.to_batches()])
+
+
+def _to_pandas(data):
+    """Convert an Arrow table or batch, releasing Arrow buffers as pandas takes over."""
+    return data.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def _detect_ts_format(series):
+    """Return TS_FORMAT if the first non-null value matches it, else None (inference)."""
+    first = series.first_valid_index()
+    if first is None or not isinstance(series.at[first], str):
+        return None
+    try:
+        datetime.strptime(series.at[first], TS_FORMAT)
+    except ValueError:
+        return None
+    return TS_FORMAT
+
+
+def _parse_timestamps(series):
+    """Convert a column to datetime, caching repeated values on large inputs."""
+    # Déjà converti (pyarrow, étape précédente): éviter l'échantillonnage du cache
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    return pd.to_datetime(series, format=_detect_ts_format(series),
+                          cache=len(series) > TS_CACHE_MIN_ROWS, errors='coerce')
+
+
 def extract_sensor_data(file_path, days_back=None):
     """
     Extract sensor data from CSV file.
@@ -22,83 +252,145 @@ def extract_sensor_data(file_path, days_back=None):
     Returns:
         pandas DataFrame with sensor readings
     """
+    # Même lecteur que le pipeline: les lots du streaming, concaténés une seule fois
     try:
-        # Read CSV file
-        df = pd.read_csv('Dataset 1 — Capteurs.csv')
-        print(f"✓ Successfully loaded sensor data: {len(df)} records")
-
-        # Convert timestamp column to datetime
-        timestamp_col = [col for col in df.columns if 'time' in col.lower() or 'date' in col.lower()]
-        if timestamp_col:
-            df[timestamp_col[0]] = pd.to_datetime(df[timestamp_col[0]], errors='coerce')
-
-            # CORRECTION: Afficher la plage de dates disponibles
-            min_date = df[timestamp_col[0]].min()
-            max_date = df[timestamp_col[0]].max()
-            print(f"📅 Date range in data: {min_date} to {max_date}")
-
-            # Filter for last N days SEULEMENT si days_back est spécifié
-            if days_back is not None:
-                cutoff_date = datetime.now() - timedelta(days=days_back)
-                original_count = len(df)
-                df = df[df[timestamp_col[0]] >= cutoff_date]
-                print(f"✓ Filtered to last {days_back} days: {len(df)}/{original_count} records")
-
-                # CORRECTION: Avertissement si aucune donnée dans la période
-                if len(df) == 0:
-                    print(f"⚠ WARNING: No data found in the last {days_back} days!")
-                    print(f"⚠ Using ALL available data instead ({original_count} records)")
-                    # Recharger toutes les données
-                    df = pd.read_csv(file_path)
-                    df[timestamp_col[0]] = pd.to_datetime(df[timestamp_col[0]], errors='coerce')
-            else:
-                print(f"✓ Using all available data: {len(df)} records")
+        batches = list(extract_sensor_data_chunks(file_path))
+        if not batches:
+            return pd.DataFrame()
+        df_all = pd.concat(batches, ignore_index=True)
 
-        return df
+        # Filter for last N days SEULEMENT si days_back est spécifié
+        timestamp_col = ColumnMap.from_columns(df_all.columns).timestamp
+        if days_back is None or not timestamp_col:
+            return df_all
+
+        # Filtre appliqué ici: la version non filtrée sert de repli sans relire le fichier
+        cutoff_date = datetime.now() - timedelta(days=days_back)
+        df = df_all[df_all[timestamp_col] >= cutoff_date]
+        print(f"✓ Filtered to last {days_back} days: {len(df)}/{len(df_all)} records")
+
+        # CORRECTION: Avertissement si aucune donnée dans la période
+        if len(df) == 0:
+            print(f"⚠ WARNING: No data found in the last {days_back} days!")
+            print(f"⚠ Using ALL available data instead ({len(df_all)} records)")
+            return df_all
+
+        return df.reset_index(drop=True)
 
-    except FileNotFoundError:
-        print(f"✗ ERROR: File not found - {file_path}")
-        return pd.DataFrame()
     except Exception as e:
         print(f"✗ ERROR extracting sensor data: {str(e)}")
         return pd.DataFrame()
 
 
+def extract_sensor_data_chunks(file_path, days_back=None, block_size=CHUNK_BLOCK_SIZE):
+    """
+    Stream sensor data from CSV file in batches.
+
+    Args:
+        file_path: Path to sensor CSV file
+        days_back: Number of days to look back (None = all data)
+        block_size: Bytes of CSV text parsed per batch
+
+    Yields:
+        pandas DataFrame batches with sensor readings
+    """
+    try:
+        read_options, convert_options = _arrow_csv_options(file_path, SENSOR_READ_ROLES, block_size=block_size)
+    except FileNotFoundError:
+        print(f"✗ ERROR: File not found - {file_path}")
+        return
+
+    timestamp_col = ColumnMap.from_columns(convert_options.include_columns).timestamp
+    cutoff_date = datetime.now() - timedelta(days=days_back) if days_back is not None else None
+
+    # Types figés d'après le premier bloc, lecture en texte puis conversion tolérante par lot
+    schema = _infer_csv_schema(file_path, read_options, convert_options)
+    text_options = _text_convert_options(convert_options)
+
+    total_count = kept_count = 0
+    min_date = max_date = None
+    with pa.memory_map(file_path) as source:
+        reader = pacsv.open_csv(source, read_options=read_options, convert_options=text_options)
+        for record_batch in reader:
+            record_batch = _cast_text_batch(record_batch, schema)
+            total_count += record_batch.num_rows
+
+            # Timestamp déjà typé par Arrow: plage et filtre calculés avant la conversion pandas,
+            # les lignes hors période ne deviennent jamais des objets pandas
+            arrow_filtered = False
+            if timestamp_col and pa.types.is_timestamp(record_batch.schema.field(timestamp_col).type):
+                bounds = pc.min_max(record_batch.column(timestamp_col)).as_py()
+                if bounds['min'] is not None:
+                    min_date = bounds['min'] if min_date is None else min(min_date, bounds['min'])
+                    max_date = bounds['max'] if max_date is None else max(max_date, bounds['max'])
+                if cutoff_date is not None:
+                    cutoff = pa.scalar(cutoff_date, type=record_batch.schema.field(timestamp_col).type)
+                    record_batch = record_batch.filter(pc.greater_equal(record_batch.column(timestamp_col), cutoff))
+                arrow_filtered = True
+
+            df = _to_pandas(record_batch)
+
+            if timestamp_col and not arrow_filtered:
+                df[timestamp_col] = _parse_timestamps(df[timestamp_col])
+                batch_min, batch_max = df[timestamp_col].min(), df[timestamp_col].max()
+                if pd.notna(batch_min):
+                    min_date = batch_min if min_date is None else min(min_date, batch_min)
+                    max_date = batch_max if max_date is None else max(max_date, batch_max)
+                if cutoff_date is not None:
+                    df = df[df[timestamp_col] >= cutoff_date]
+
+            kept_count += len(df)
+            if len(df):
+                yield df
+
+    print(f"✓ Successfully loaded sensor data: {total_count} records")
+    if timestamp_col:
+        print(f"📅 Date range in data: {min_date} to {max_date}")
+        if cutoff_date is not None:
+            print(f"✓ Filtered to last {days_back} days: {kept_count}/{total_count} records")
+
+
 def extract_quality_data(file_path):
     """Extract quality inspection data with encoding handling."""
-    encodings = ['utf-8', 'iso-8859-1', 'latin1']
+    # latin1 décode n'importe quel octet: un seul repli suffit (iso-8859-1 est identique)
+    encodings = ['utf-8', 'latin1']
 
     for encoding in encodings:
         try:
-            df = pd.read_csv('Dataset 2 — Qualité.csv', encoding=encoding)
-            print(f"✓ Successfully loaded quality data with {encoding}: {len(df)} records")
+            table = _read_csv_table(file_path, QUALITY_READ_ROLES, encoding=encoding)
+            original_count = table.num_rows
 
-            # Convert timestamp if exists
-            timestamp_cols = [col for col in df.columns if 'time' in col.lower() or 'date' in col.lower()]
-            if timestamp_cols:
-                df[timestamp_cols[0]] = pd.to_datetime(df[timestamp_cols[0]], errors='coerce')
-                min_date = df[timestamp_cols[0]].min()
-                max_date = df[timestamp_cols[0]].max()
-                print(f"📅 Quality data range: {min_date} to {max_date}")
+            # Filter for completed inspections if status column exists (dans Arrow, avant pandas)
+            status_col = ColumnMap.from_columns(table.column_names).status
+            if status_col:
+                table = table.filter(pc.is_valid(table.column(status_col)))
 
-            # Filter for completed inspections if status column exists
-            status_cols = [col for col in df.columns if 'status' in col.lower()]
-            if status_cols:
-                original_count = len(df)
-                df = df[df[status_cols[0]].notna()]
+            df = _to_pandas(table)
+            print(f"✓ Successfully loaded quality data with {encoding}: {original_count} records")
+            if status_col:
                 print(f"✓ Filtered completed inspections: {len(df)}/{original_count} records")
 
+            # Convert timestamp if exists
+            timestamp_col = ColumnMap.from_columns(df.columns).timestamp
+            if timestamp_col:
+                df[timestamp_col] = _parse_timestamps(df[timestamp_col])
+                min_date = df[timestamp_col].min()
+                max_date = df[timestamp_col].max()
+                print(f"📅 Quality data range: {min_date} to {max_date}")
+
             return df
 
-        except UnicodeDecodeError:
+        except (pa.ArrowInvalid, UnicodeDecodeError) as e:
+            # Texte lu en pa.string(): de l'UTF-8 invalide lève ArrowInvalid -> encodage suivant
+            if encoding == encodings[-1]:  # Last encoding
+                print(f"✗ ERROR: Could not read file with any encoding: {str(e)}")
             continue
         except FileNotFoundError:
             print(f"✗ ERROR: File not found - {file_path}")
             return pd.DataFrame()
         except Exception as e:
-            if encoding == encodings[-1]:  # Last encoding
-                print(f"✗ ERROR: Could not read file with any encoding: {str(e)}")
-            continue
+            print(f"✗ ERROR extracting quality data: {str(e)}")
+            return pd.DataFrame()
 
     return pd.DataFrame()
 
@@ -107,19 +399,49 @@ def extract_quality_data(file_path):
 # PHASE 2: TRANSFORM
 # ============================================================================
 
-def clean_sensor_data(df):
-    """Clean sensor data by handling error codes and validating ranges."""
+def _clean_sensor_values(values, min_vals, max_vals, last_values):
+    """
+    Replace error codes and out-of-range values, then forward fill, on a 2-D array.
+
+    values holds one sensor column per column; min_vals, max_vals and last_values
+    (last valid reading of the previous batch, NaN if none) hold one entry per column.
+
+    Returns:
+        (cleaned values, mask of estimated cells, mask of still invalid cells)
+    """
+    # NaN échoue aux deux comparaisons: un seul masque couvre NaN et hors plage,
+    # calculé en une passe sur toutes les colonnes capteurs
+    bad = ~((values >= min_vals) & (values <= max_vals)) | np.isin(values, ERROR_CODES)
+    values = np.where(bad, np.nan, values)
+    if len(values):
+        # reprise du remplissage depuis le lot précédent
+        values[0] = np.where(bad[0], last_values, values[0])
+
+    # Forward fill: index of the last valid row at or before each position
+    last_valid = np.where(bad, 0, np.arange(len(values))[:, None])
+    np.maximum.accumulate(last_valid, axis=0, out=last_valid)
+    cleaned = np.take_along_axis(values, last_valid, axis=0)
+
+    invalid = np.isnan(cleaned)
+    estimated = bad & ~invalid
+    return cleaned, estimated, invalid
+
+
+def clean_sensor_data(df, carry=None, verbose=True):
+    """
+    Clean sensor data by handling error codes and validating ranges.
+
+    Args:
+        df: Sensor DataFrame (whole file or one batch)
+        carry: Optional dict column -> last valid value, updated in place so that
+            the forward fill continues across consecutive batches
+        verbose: Print the cleaning summary (off for batches, printed once by the caller)
+    """
     if df.empty:
         return df
 
-    df_clean = df.copy()
-
-    # Identify sensor columns
-    sensor_cols = {
-        'temperature': [col for col in df.columns if 'temp' in col.lower()],
-        'pressure': [col for col in df.columns if 'press' in col.lower()],
-        'vibration': [col for col in df.columns if 'vibr' in col.lower()]
-    }
+    # Copie superficielle: seules les colonnes réécrites sont réallouées
+    df_clean = df.copy(deep=False)
 
     # Valid ranges
     ranges = {
@@ -128,140 +450,182 @@ def clean_sensor_data(df):
         'vibration': (0, 100)
     }
 
-    # Initialize data quality flag
-    df_clean['data_quality'] = 'good'
+    # Identify sensor columns (toutes traitées ensemble dans un seul bloc 2-D)
+    # dans l'ordre des rôles de ranges: le dernier drapeau appliqué l'emporte
+    column_roles = {col: classify_column(col) for col in df.columns}
+    sensor_cols = [col for role in ranges for col, col_role in column_roles.items() if col_role == role]
+
+    # Initialize data quality flag (uint8 codes, see DATA_QUALITY_LEVELS)
+    quality_codes = np.full(len(df_clean), QUALITY_GOOD, dtype=np.uint8)
 
-    for sensor_type, cols in sensor_cols.items():
-        for col in cols:
-            if col not in df_clean.columns:
-                continue
+    if sensor_cols:
+        min_vals, max_vals = np.array([ranges[column_roles[col]] for col in sensor_cols]).T
+        last_values = np.array([carry.get(col, np.nan) if carry is not None else np.nan
+                                for col in sensor_cols], dtype=MEASUREMENT_DTYPE)
+        values = df_clean[sensor_cols].to_numpy(dtype=MEASUREMENT_DTYPE, na_value=np.nan)
+        cleaned, estimated, invalid = _clean_sensor_values(values, min_vals, max_vals, last_values)
+        if carry is not None:
+            carry.update(zip(sensor_cols, cleaned[-1]))
 
-            # Replace error codes with NaN
-            df_clean[col] = df_clean[col].replace([-999, -1, None], np.nan)
+        for i, col in enumerate(sensor_cols):
+            df_clean[col] = cleaned[:, i]
+            quality_codes = np.select(
+                [invalid[:, i], estimated[:, i]],
+                [np.uint8(QUALITY_INVALID), np.uint8(QUALITY_ESTIMATED)],
+                default=quality_codes
+            )
 
-            # Validate ranges
-            min_val, max_val = ranges.get(sensor_type, (None, None))
-            if min_val is not None:
-                invalid_mask = (df_clean[col] < min_val) | (df_clean[col] > max_val)
-                invalid_indices = df_clean[invalid_mask].index
-                df_clean.loc[invalid_mask, col] = np.nan
-                df_clean.loc[invalid_indices, 'data_quality'] = 'invalid'
+    df_clean['data_quality'] = pd.Categorical.from_codes(quality_codes, categories=DATA_QUALITY_LEVELS)
 
-            # Forward fill missing values
-            filled_mask = df_clean[col].isna()
-            df_clean[col] = df_clean[col].ffill()
+    if verbose:
+        _print_cleaning_summary(df_clean)
 
-            # Mark estimated values
-            estimated_mask = filled_mask & df_clean[col].notna()
-            df_clean.loc[estimated_mask, 'data_quality'] = 'estimated'
+    return df_clean
 
-            # Mark still NaN values as invalid
-            still_nan_mask = df_clean[col].isna()
-            df_clean.loc[still_nan_mask, 'data_quality'] = 'invalid'
 
+def _print_cleaning_summary(df_clean):
+    """Print the record count and data_quality distribution of cleaned sensor data."""
     print(f"✓ Cleaned sensor data: {len(df_clean)} records")
     quality_dist = df_clean['data_quality'].value_counts().to_dict()
     print(f"  Quality distribution: {quality_dist}")
 
-    return df_clean
-
 
-def standardize_data(df):
-    """Standardize data formats and naming conventions."""
+def standardize_data(df, id_offset=0, verbose=True):
+    """Standardize data formats and naming conventions (record ids start at id_offset)."""
     if df.empty:
         return df
 
-    df_std = df.copy()
+    # Copie superficielle: seules les colonnes réécrites sont réallouées
+    df_std = df.copy(deep=False)
 
-    # Remove spaces from column names and lowercase
-    df_std.columns = df_std.columns.str.strip().str.lower().str.replace(' ', '_')
+    # Remove spaces from column names and lowercase (une douzaine de noms: boucle Python)
+    df_std.columns = [col.strip().lower().replace(' ', '_') for col in df_std.columns]
 
-    # Convert timestamps to datetime
-    for col in df_std.columns:
-        if 'time' in col or 'date' in col:
-            if df_std[col].dtype != 'datetime64[ns]':
-                df_std[col] = pd.to_datetime(df_std[col], errors='coerce')
+    # Convert timestamps to datetime (seule la colonne du rôle timestamp)
+    timestamp_col = ColumnMap.from_columns(df_std.columns).timestamp
+    if timestamp_col:
+        df_std[timestamp_col] = _parse_timestamps(df_std[timestamp_col])
 
-    # Lowercase machine/sensor names
     for col in df_std.columns:
-        if 'machine' in col or 'line' in col or 'sensor' in col:
-            if df_std[col].dtype == 'object':
-                df_std[col] = df_std[col].str.lower().str.strip()
+        # Lowercase machine/line names
+        if classify_column(col) in ('machine', 'line'):
+            series = df_std[col]
+            # CORRECTION: pandas 3 lit le texte en dtype str, pas object -> noyaux Arrow
+            if isinstance(series.dtype, pd.StringDtype):
+                values = pc.utf8_lower(pc.utf8_trim_whitespace(pa.array(series, from_pandas=True)))
+                df_std[col] = pd.Series(pd.array(values, dtype=series.dtype), index=series.index)
+            elif series.dtype == 'object':
+                df_std[col] = series.str.lower().str.strip()
 
     # CORRECTION: Supprimer l'ancien record_id s'il existe, puis en créer un nouveau
     if 'record_id' in df_std.columns:
         df_std = df_std.drop(columns=['record_id'])
 
-    # Create unique record_id
-    df_std['record_id'] = [f"REC_{i:08d}" for i in range(len(df_std))]
+    # Create unique record_id (REC_00000000, ...) with Arrow string kernels
+    row_numbers = pc.cast(pa.array(np.arange(id_offset, id_offset + len(df_std))), pa.string())
+    record_ids = pc.binary_join_element_wise('REC_', pc.utf8_lpad(row_numbers, 8, '0'), '')
+    df_std['record_id'] = pd.array(record_ids, dtype='string[pyarrow]')
 
-    print(f"✓ Standardized data: {len(df_std)} records")
+    if verbose:
+        print(f"✓ Standardized data: {len(df_std)} records")
 
     return df_std
 
 
-def join_sensor_quality_data(sensor_df, quality_df):
-    """Join sensor readings with quality checks."""
+def _quality_status_column(codes):
+    """Categorical quality_status from codes (see QUALITY_STATUS_LEVELS)."""
+    return pd.Categorical.from_codes(codes, categories=QUALITY_STATUS_LEVELS)
+
+
+def join_sensor_quality_data(sensor_df, quality_df, sensor_cols=None, quality_cols=None):
+    """
+    Join sensor readings with quality checks.
+
+    Args:
+        sensor_df: Standardized sensor DataFrame
+        quality_df: Standardized quality DataFrame
+        sensor_cols, quality_cols: ColumnMap of each frame (detected if None)
+
+    Returns:
+        pandas DataFrame with a quality_status column
+    """
     if sensor_df.empty:
         return sensor_df
 
     if quality_df.empty:
-        sensor_df['quality_status'] = 'not_checked'
+        sensor_df['quality_status'] = _quality_status_column(np.full(len(sensor_df), STATUS_NOT_CHECKED))
         print("⚠ No quality data available - marking all as 'not_checked'")
         return sensor_df
 
-    # Find join columns
-    sensor_time_cols = [col for col in sensor_df.columns if 'time' in col or 'date' in col]
-    quality_time_cols = [col for col in quality_df.columns if 'time' in col or 'date' in col]
-
-    sensor_machine_cols = [col for col in sensor_df.columns if 'machine' in col or 'line' in col]
-    quality_machine_cols = [col for col in quality_df.columns if 'machine' in col or 'line' in col]
+    sensor_cols = sensor_cols or ColumnMap.from_columns(sensor_df.columns)
+    quality_cols = quality_cols or ColumnMap.from_columns(quality_df.columns)
 
-    if not sensor_time_cols or not quality_time_cols:
+    if not sensor_cols.timestamp or not quality_cols.timestamp:
         print("⚠ No timestamp columns found for joining")
-        sensor_df['quality_status'] = 'not_checked'
+        sensor_df['quality_status'] = _quality_status_column(np.full(len(sensor_df), STATUS_NOT_CHECKED))
         return sensor_df
 
-    sensor_time_col = sensor_time_cols[0]
-    quality_time_col = quality_time_cols[0]
-    sensor_machine_col = sensor_machine_cols[0] if sensor_machine_cols else None
-    quality_machine_col = quality_machine_cols[0] if quality_machine_cols else None
+    sensor_time_col = sensor_cols.timestamp
+    quality_time_col = quality_cols.timestamp
+    sensor_machine_col = sensor_cols.machine or sensor_cols.line
+    quality_machine_col = quality_cols.machine or quality_cols.line
 
-    # Standardize quality data
-    quality_df_std = quality_df.copy()
-    quality_df_std.columns = quality_df_std.columns.str.strip().str.lower().str.replace(' ', '_')
+    quality_df_std = quality_df.copy(deep=False)
+    quality_df_std[quality_time_col] = _parse_timestamps(quality_df_std[quality_time_col])
 
-    if quality_df_std[quality_time_col].dtype != 'datetime64[ns]':
-        quality_df_std[quality_time_col] = pd.to_datetime(quality_df_std[quality_time_col], errors='coerce')
+    # Aligner la résolution des timestamps (merge_asof exige des clés de même dtype)
+    quality_df_std[quality_time_col] = quality_df_std[quality_time_col].astype(sensor_df[sensor_time_col].dtype)
+    quality_df_std = quality_df_std[quality_df_std[quality_time_col].notna()]
 
-    # Perform LEFT JOIN
+    # Factorize machine ids into shared integer codes for the join key
+    by_col = None
     if sensor_machine_col and quality_machine_col:
-        joined_df = sensor_df.merge(
-            quality_df_std,
-            left_on=[sensor_time_col, sensor_machine_col],
-            right_on=[quality_time_col, quality_machine_col],
-            how='left',
-            suffixes=('', '_quality')
-        )
-    else:
-        joined_df = sensor_df.merge(
-            quality_df_std,
-            left_on=sensor_time_col,
-            right_on=quality_time_col,
-            how='left',
-            suffixes=('', '_quality')
-        )
+        by_col = '_machine_code'
+        codes, _ = pd.factorize(pd.concat(
+            [sensor_df[sensor_machine_col], quality_df_std[quality_machine_col]], ignore_index=True
+        ))
+        sensor_df = sensor_df.assign(**{by_col: codes[:len(sensor_df)]})
+        quality_df_std = quality_df_std.drop(columns=[quality_machine_col])
+        quality_df_std[by_col] = codes[len(sensor_df):]
+
+    # Préfixer les colonnes qualité: aucune collision de noms possible avec les capteurs
+    quality_df_std = quality_df_std.rename(
+        columns={col: QUALITY_PREFIX + col for col in quality_df_std.columns if col != by_col}
+    )
+    quality_time_col = QUALITY_PREFIX + quality_time_col
+
+    # Perform LEFT JOIN: each reading gets the nearest quality check within tolerance
+    has_time = sensor_df[sensor_time_col].notna().to_numpy()
+    order = np.flatnonzero(has_time)[np.argsort(sensor_df[sensor_time_col].to_numpy()[has_time], kind='stable')]
+    joined_df = pd.merge_asof(
+        sensor_df.iloc[order],
+        quality_df_std.sort_values(quality_time_col, kind='stable'),
+        left_on=sensor_time_col,
+        right_on=quality_time_col,
+        by=by_col,
+        tolerance=JOIN_TOLERANCE,
+        direction='nearest'
+    )
+
+    # Restaurer l'ordre d'origine (les lectures sans timestamp restent sans contrôle)
+    joined_df = pd.concat([joined_df, sensor_df[~has_time]], ignore_index=True)
+    joined_df = joined_df.iloc[np.argsort(np.concatenate([order, np.flatnonzero(~has_time)]))]
+    joined_df = joined_df.reset_index(drop=True)
+    if by_col:
+        joined_df = joined_df.drop(columns=[by_col])
 
     # Add quality_status column
-    result_cols = [col for col in joined_df.columns if 'result' in col.lower()]
-    if result_cols:
-        joined_df['quality_status'] = joined_df[result_cols[0]].apply(
-            lambda x: 'pass' if pd.notna(x) and 'pass' in str(x).lower()
-            else 'fail' if pd.notna(x) and 'fail' in str(x).lower()
-            else 'not_checked'
-        )
+    result_col = sensor_cols.result or (quality_cols.result and QUALITY_PREFIX + quality_cols.result)
+    if result_col and result_col in joined_df.columns:
+        result = joined_df[result_col].astype('string').str.lower()
+        joined_df['quality_status'] = _quality_status_column(np.select(
+            [result.str.contains('pass', regex=False, na=False),
+             result.str.contains('fail', regex=False, na=False)],
+            [STATUS_PASS, STATUS_FAIL],
+            default=STATUS_NOT_CHECKED
+        ))
     else:
-        joined_df['quality_status'] = 'not_checked'
+        joined_df['quality_status'] = _quality_status_column(np.full(len(joined_df), STATUS_NOT_CHECKED))
 
     print(f"✓ Joined sensor and quality data: {len(joined_df)} records")
     status_dist = joined_df['quality_status'].value_counts().to_dict()
@@ -270,84 +634,40 @@ def join_sensor_quality_data(sensor_df, quality_df):
     return joined_df
 
 
-def calculate_hourly_summaries(df):
-    """Calculate hourly aggregates from joined data."""
+def calculate_hourly_summaries(df, columns=None):
+    """Calculate hourly aggregates from joined data (columns: ColumnMap, detected if None)."""
     if df.empty:
         return pd.DataFrame()
 
-    # Find timestamp column
-    time_cols = [col for col in df.columns if 'time' in col and 'quality' not in col]
-    if not time_cols:
+    columns = columns or ColumnMap.from_columns(df.columns)
+    if not columns.timestamp:
         print("✗ No timestamp column found")
         return pd.DataFrame()
 
-    time_col = time_cols[0]
-
     # Create hour column
-    df['hour'] = df[time_col].dt.floor('h')  # CORRECTION: 'h' au lieu de 'H'
+    df['hour'] = df[columns.timestamp].dt.floor('h')  # CORRECTION: 'h' au lieu de 'H'
 
     # Identify grouping columns
-    group_cols = ['hour']
-    for col in df.columns:
-        if ('line' in col.lower() or 'machine' in col.lower()) and 'quality' not in col:
-            if col not in group_cols:
-                group_cols.append(col)
+    group_cols = ['hour'] + [col for col in (columns.line, columns.machine) if col]
 
     # Identify sensor columns
-    sensor_mapping = {}
-    for col in df.columns:
-        if 'temp' in col.lower() and 'quality' not in col:
-            sensor_mapping['temperature'] = col
-        elif 'press' in col.lower() and 'quality' not in col:
-            sensor_mapping['pressure'] = col
-        elif 'vibr' in col.lower() and 'quality' not in col:
-            sensor_mapping['vibration'] = col
-        elif 'power' in col.lower() and 'quality' not in col:
-            sensor_mapping['power'] = col
-
-    # Build aggregation dictionary
-    agg_dict = {}
-    for sensor_name, col_name in sensor_mapping.items():
-        agg_dict[col_name] = ['mean', 'min', 'max', 'std']
-
-    # Perform aggregation
-    summary = df.groupby(group_cols, as_index=False).agg(agg_dict)
-
-    # Flatten column names
-    new_columns = []
-    for col in summary.columns:
-        if isinstance(col, tuple):
-            sensor_col, stat = col
-            sensor_name = None
-            for name, original_col in sensor_mapping.items():
-                if original_col == sensor_col:
-                    sensor_name = name
-                    break
-            if sensor_name:
-                stat_map = {'mean': 'avg', 'min': 'min', 'max': 'max', 'std': 'std'}
-                new_columns.append(f"{stat_map[stat]}_{sensor_name}")
-            else:
-                new_columns.append('_'.join(str(c) for c in col).strip('_'))
-        else:
-            new_columns.append(col)
-
-    summary.columns = new_columns
-
-    # Calculate quality metrics
-    quality_stats = df.groupby(group_cols, as_index=False).agg({
-        'quality_status': [
-            ('total_checks', 'count'),
-            ('defect_count', lambda x: (x == 'fail').sum())
-        ]
-    })
-
-    quality_stats.columns = group_cols + ['total_checks', 'defect_count']
-    quality_stats['defect_rate'] = (
-            quality_stats['defect_count'] / quality_stats['total_checks'] * 100
-    ).fillna(0)
+    sensor_mapping = columns.sensors()
+
+    # Single groupby pass: sensor statistics and quality metrics together
+    stat_prefixes = {'mean': 'avg', 'min': 'min', 'max': 'max', 'std': 'std'}
+    named_aggs = {
+        f"{prefix}_{sensor_name}": (col_name, stat)
+        for sensor_name, col_name in sensor_mapping.items()
+        for stat, prefix in stat_prefixes.items()
+    }
+    named_aggs['total_checks'] = ('is_fail', 'size')
+    named_aggs['defect_count'] = ('is_fail', 'sum')
 
-    # Merge
-    summary = summary.merge(quality_stats, on=group_cols, how='left')
+    agg_input = df[group_cols + list(sensor_mapping.values())].assign(
+        is_fail=(df['quality_status'] == 'fail').astype('int8')
+    )
+    summary = agg_input.groupby(group_cols, as_index=False, sort=False, observed=True).agg(**named_aggs)
+    summary['defect_rate'] = (summary['defect_count'] / summary['total_checks'] * 100).fillna(0)
 
     print(f"✓ Calculated hourly summaries: {len(summary)} records")
 
@@ -358,13 +678,35 @@ def calculate_hourly_summaries(df):
 # PHASE 3: LOAD
 # ============================================================================
 
-def create_database(db_path='production.db'):
-    """Create SQLite database with required schema."""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS sensor_readings (
+# Rôle -> colonne de la base (record_id et data_quality gardent leur nom)
+SENSOR_TABLE_COLUMNS = {
+    'timestamp': 'timestamp',
+    'line': 'line_id',
+    'machine': 'machine_id',
+    'temperature': 'temperature',
+    'pressure': 'pressure',
+    'vibration': 'vibration',
+    'power': 'power',
+}
+SUMMARY_GROUP_COLUMNS = {
+    'line': 'line_id',
+    'machine': 'machine_id',
+}
+QUALITY_TABLE_COLUMNS = {
+    'timestamp': 'timestamp',
+    'line': 'line_id',
+    'machine': 'machine_id',
+    'result': 'result',
+    'defect': 'defect_type',
+}
+# Export Parquet (colonnaire, compressé) à côté de la base SQLite pour l'analyse
+PARQUET_COMPRESSION = 'zstd'
+PARQUET_ROW_GROUP_SIZE = 100_000
+
+# Schéma déclaré des tables (clés primaires comprises)
+TABLE_SCHEMAS = {
+    'sensor_readings': '''
+    CREATE TABLE sensor_readings (
         record_id TEXT PRIMARY KEY,
         timestamp DATETIME,
         line_id TEXT,
@@ -375,10 +717,9 @@ def create_database(db_path='production.db'):
         power REAL,
         data_quality TEXT
     )
-    ''')
-
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS quality_checks (
+    ''',
+    'quality_checks': '''
+    CREATE TABLE quality_checks (
         check_id INTEGER PRIMARY KEY AUTOINCREMENT,
         timestamp DATETIME,
         line_id TEXT,
@@ -386,10 +727,9 @@ def create_database(db_path='production.db'):
         result TEXT,
         defect_type TEXT
     )
-    ''')
-
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS hourly_summary (
+    ''',
+    'hourly_summary': '''
+    CREATE TABLE hourly_summary (
         summary_id INTEGER PRIMARY KEY AUTOINCREMENT,
         hour DATETIME,
         line_id TEXT,
@@ -397,13 +737,65 @@ def create_database(db_path='production.db'):
         avg_temperature REAL,
         min_temperature REAL,
         max_temperature REAL,
+        std_temperature REAL,
         avg_pressure REAL,
+        min_pressure REAL,
+        max_pressure REAL,
+        std_pressure REAL,
         avg_vibration REAL,
+        min_vibration REAL,
+        max_vibration REAL,
+        std_vibration REAL,
+        avg_power REAL,
+        min_power REAL,
+        max_power REAL,
+        std_power REAL,
         total_checks INTEGER,
         defect_count INTEGER,
         defect_rate REAL
     )
-    ''')
+    ''',
+}
+
+# Index de lecture -> cible; supprimés pendant le chargement, recréés ensuite
+TABLE_INDEXES = {
+    'idx_sr_timestamp': 'sensor_readings(timestamp)',
+    'idx_hs_hour': 'hourly_summary(hour)',
+    # Index couvrants pour les agrégations par machine (test.py, TEST 7 et 8)
+    'idx_sr_machine_temp': 'sensor_readings(machine_id, temperature)',
+    'idx_hs_machine': 'hourly_summary(machine_id, defect_rate)',
+    # Index étroit pour les agrégats globaux du taux de défaut (TEST 6)
+    'idx_hs_defect': 'hourly_summary(defect_rate)',
+}
+
+
+def _table_layout(conn, table):
+    """(name, type, pk) of each column of a table, empty if the table does not exist."""
+    return [(row[1], row[2].upper(), row[5]) for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def create_database(db_path='production.db'):
+    """
+    Open the SQLite database and create the tables that do not exist yet.
+
+    Existing tables are kept; only a table whose layout differs from TABLE_SCHEMAS
+    (ex: ancienne table to_sql sans clé primaire) is dropped and recreated.
+    """
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    # Disposition attendue de chaque table, lue sur une base en mémoire
+    reference = sqlite3.connect(':memory:')
+    for table, ddl in TABLE_SCHEMAS.items():
+        reference.execute(ddl)
+        layout = _table_layout(conn, table)
+        if layout and layout != _table_layout(reference, table):
+            print(f"⚠ Migrating table '{table}' to the current schema (existing rows dropped)")
+            cursor.execute(f"DROP TABLE {table}")
+            layout = []
+        if not layout:
+            cursor.execute(ddl)
+    reference.close()
 
     conn.commit()
     print(f"✓ Database created: {db_path}")
@@ -411,94 +803,98 @@ def create_database(db_path='production.db'):
     return conn
 
 
-def load_to_database(sensor_df, quality_df, summary_df, conn):
-    """Load transformed data into SQLite database."""
+def _widen_float32(df):
+    """Float32 columns as float64 for storage, keeping their shortest representation."""
+    # float32 -> float64 direct: 69.83 deviendrait 69.83000183105469 dans SQLite/Parquet;
+    # passer par le texte garde la valeur décimale lue (69.83), avec les noyaux Arrow
+    float32_cols = df.select_dtypes(include='float32').columns
+    if len(float32_cols) == 0:
+        return df
+    df = df.copy(deep=False)
+    for col in float32_cols:
+        text = pc.cast(pa.array(df[col], from_pandas=True), pa.string())
+        df[col] = pd.Series(pc.cast(text, pa.float64()).to_numpy(zero_copy_only=False), index=df.index)
+    return df
+
+
+def _insert_rows(conn, table, df):
+    """Replace the rows of an existing table with executemany (columns matched by name)."""
+    table_cols = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    cols = [col for col in df.columns if col in table_cols]
+    rows = _widen_float32(df[cols].copy(deep=False))
+
+    # sqlite3 ne sait pas lier les Timestamp pandas: texte ISO, NaT -> NULL
+    for col in cols:
+        if pd.api.types.is_datetime64_any_dtype(rows[col]):
+            rows[col] = rows[col].dt.strftime(TS_FORMAT)
+
+    conn.execute(f"DELETE FROM {table}")
+    # DELETE ne remet pas AUTOINCREMENT à zéro: check_id/summary_id repartent de 1 à chaque load
+    conn.execute("DELETE FROM sqlite_sequence WHERE name = ?", (table,))
+    conn.executemany(
+        f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+        rows.itertuples(index=False, name=None)
+    )
+
+
+def _summary_table(summary_df):
+    """Hourly summary with the hourly_summary table's column names."""
+    summary_load = summary_df.copy(deep=False)
+    summary_load.columns = summary_load.columns.str.lower()
+    group_cols = ColumnMap.from_columns(summary_load.columns).rename_map(SUMMARY_GROUP_COLUMNS)
+    return summary_load.rename(columns=group_cols)
+
+
+def load_to_database(sensor_df, quality_df, summary_df, conn, sensor_cols=None, quality_cols=None):
+    """Load transformed data into SQLite database (ColumnMaps detected if None)."""
     try:
+        # Chargement en masse: pas de fsync ni de journal disque pendant le load
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("PRAGMA journal_mode=MEMORY")
+
+        # Index supprimés dans la même transaction que le chargement (restaurés par le rollback):
+        # les maintenir ligne à ligne pendant DELETE + executemany coûte plus que les recréer
+        conn.execute("BEGIN")
+        for index_name in TABLE_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {index_name}")
+
         # Load sensor readings
         if not sensor_df.empty:
-            sensor_load = sensor_df.copy()
-
-            # CORRECTION: D'abord, supprimer toutes les colonnes en double
-            sensor_load = sensor_load.loc[:, ~sensor_load.columns.duplicated()]
-
-            # Identifier les colonnes disponibles (sans créer de duplicates)
-            col_map = {}
-            for col in sensor_load.columns:
-                col_lower = col.lower()
-                if 'record_id' == col_lower and 'record_id' not in col_map.values():
-                    col_map[col] = 'record_id'
-                elif ('time' in col_lower or 'date' in col_lower) and 'timestamp' not in col_map.values():
-                    col_map[col] = 'timestamp'
-                elif 'line' in col_lower and 'quality' not in col_lower and 'line_id' not in col_map.values():
-                    col_map[col] = 'line_id'
-                elif 'machine' in col_lower and 'quality' not in col_lower and 'machine_id' not in col_map.values():
-                    col_map[col] = 'machine_id'
-                elif 'temp' in col_lower and 'quality' not in col_lower and 'temperature' not in col_map.values():
-                    col_map[col] = 'temperature'
-                elif 'press' in col_lower and 'quality' not in col_lower and 'pressure' not in col_map.values():
-                    col_map[col] = 'pressure'
-                elif 'vibr' in col_lower and 'quality' not in col_lower and 'vibration' not in col_map.values():
-                    col_map[col] = 'vibration'
-                elif 'power' in col_lower and 'quality' not in col_lower and 'power' not in col_map.values():
-                    col_map[col] = 'power'
-                elif 'data_quality' == col_lower and 'data_quality' not in col_map.values():
-                    col_map[col] = 'data_quality'
-
-            # Renommer et sélectionner uniquement les colonnes mappées
-            sensor_load = sensor_load.rename(columns=col_map)
-
-            # Ordre des colonnes pour la base de données
-            target_cols = ['record_id', 'timestamp', 'line_id', 'machine_id',
-                           'temperature', 'pressure', 'vibration', 'power', 'data_quality']
-            available_cols = [c for c in target_cols if c in sensor_load.columns]
-
-            # Sélectionner uniquement ces colonnes (élimine les doublons)
-            sensor_load = sensor_load[available_cols].copy()
-
-            # Vérification finale: pas de colonnes dupliquées
-            if sensor_load.columns.duplicated().any():
-                print(f"⚠ Removing duplicate columns: {sensor_load.columns[sensor_load.columns.duplicated()].tolist()}")
-                sensor_load = sensor_load.loc[:, ~sensor_load.columns.duplicated()]
+            # Colonnes source -> colonnes de la table (la jointure ne crée plus de doublons)
+            sensor_cols = sensor_cols or ColumnMap.from_columns(sensor_df.columns)
+            col_map = {'record_id': 'record_id', **sensor_cols.rename_map(SENSOR_TABLE_COLUMNS),
+                       'data_quality': 'data_quality'}
+            col_map = {src: dst for src, dst in col_map.items() if src in sensor_df.columns}
+            sensor_load = sensor_df[list(col_map)].rename(columns=col_map)
 
             if 'record_id' in sensor_load.columns:
                 print(f"📋 Columns to load: {sensor_load.columns.tolist()}")
-                sensor_load.to_sql('sensor_readings', conn, if_exists='replace', index=False)
+                _insert_rows(conn, 'sensor_readings', sensor_load)
                 print(f"✓ Loaded {len(sensor_load)} sensor readings")
             else:
                 print("⚠ Could not map sensor columns to database schema")
 
         if not quality_df.empty:
-            quality_load = quality_df.copy()
-
-            col_map = {}
-            for col in quality_load.columns:
-                if 'time' in col.lower() or 'date' in col.lower():
-                    if 'timestamp' not in col_map.values():
-                        col_map[col] = 'timestamp'
-                elif 'line' in col.lower() and 'line_id' not in col_map.values():
-                    col_map[col] = 'line_id'
-                elif 'machine' in col.lower() and 'machine_id' not in col_map.values():
-                    col_map[col] = 'machine_id'
-                elif 'result' in col.lower() and 'result' not in col_map.values():
-                    col_map[col] = 'result'
-                elif 'defect' in col.lower() or 'fault' in col.lower():
-                    if 'defect_type' not in col_map.values():
-                        col_map[col] = 'defect_type'
-
-            quality_load = quality_load.rename(columns=col_map)
-            quality_load = quality_load[[c for c in col_map.values() if c in quality_load.columns]]
+            quality_cols = quality_cols or ColumnMap.from_columns(quality_df.columns)
+            col_map = quality_cols.rename_map(QUALITY_TABLE_COLUMNS)
+            quality_load = quality_df[list(col_map)].rename(columns=col_map)
 
             if not quality_load.empty:
-                quality_load.to_sql('quality_checks', conn, if_exists='replace', index=False)
+                _insert_rows(conn, 'quality_checks', quality_load)
                 print(f"✓ Loaded {len(quality_load)} quality checks")
 
         if not summary_df.empty:
-            summary_load = summary_df.copy()
-            summary_load.columns = summary_load.columns.str.lower()
-            summary_load.to_sql('hourly_summary', conn, if_exists='replace', index=False)
+            summary_load = _summary_table(summary_df)
+            _insert_rows(conn, 'hourly_summary', summary_load)
             print(f"✓ Loaded {len(summary_load)} hourly summaries")
 
         conn.commit()
+
+        # Index recréés après l'insertion, en une passe par index
+        for index_name, target in TABLE_INDEXES.items():
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {target}")
+        conn.execute("ANALYZE")
+        conn.commit()
         print("✓ All data successfully loaded to database")
 
     except Exception as e:
@@ -508,10 +904,61 @@ def load_to_database(sensor_df, quality_df, summary_df, conn):
         conn.rollback()
 
 
+def export_parquet(sensor_df, summary_df, db_path='production.db'):
+    """
+    Write the cleaned sensor data and hourly summaries as Parquet files next to the database.
+
+    Returns:
+        List of written file paths
+    """
+    base_path = os.path.splitext(db_path)[0]
+    outputs = {f"{base_path}_sensor.parquet": sensor_df,
+               f"{base_path}_hourly.parquet": _summary_table(summary_df) if not summary_df.empty else summary_df}
+
+    written = []
+    for path, df in outputs.items():
+        if df.empty:
+            continue
+        try:
+            pq.write_table(pa.Table.from_pandas(_widen_float32(df), preserve_index=False), path,
+                           compression=PARQUET_COMPRESSION, row_group_size=PARQUET_ROW_GROUP_SIZE)
+            print(f"✓ Exported {len(df)} rows to {path}")
+            written.append(path)
+        except Exception as e:
+            print(f"✗ ERROR exporting {path}: {str(e)}")
+    return written
+
+
 # ============================================================================
 # MAIN PIPELINE
 # ============================================================================
 
+def _extract_transform_sensor_data(sensor_file, days_back=None):
+    """Clean and standardize each sensor batch as it is read, concatenating once at the end."""
+    batches = []
+    carry = {}
+    record_count = 0
+    for batch in extract_sensor_data_chunks(sensor_file, days_back=days_back):
+        batch = clean_sensor_data(batch, carry, verbose=False)
+        batch = standardize_data(batch, id_offset=record_count, verbose=False)
+        record_count += len(batch)
+        batches.append(batch)
+
+    if not batches and days_back is not None:
+        print(f"⚠ WARNING: No data found in the last {days_back} days!")
+        print("⚠ Using ALL available data instead")
+        return _extract_transform_sensor_data(sensor_file, days_back=None)
+
+    if not batches:
+        return pd.DataFrame()
+
+    # Résumés imprimés une seule fois pour l'ensemble des lots
+    sensor_std = pd.concat(batches, ignore_index=True)
+    _print_cleaning_summary(sensor_std)
+    print(f"✓ Standardized data: {len(sensor_std)} records")
+    return sensor_std
+
+
 def run_etl_pipeline(sensor_file, quality_file, db_path='production.db', days_back=None):
     """
     Execute the complete ETL pipeline.
@@ -528,27 +975,35 @@ def run_etl_pipeline(sensor_file, quality_file, db_path='production.db', days_ba
 
     # PHASE 1: EXTRACT
     print("\n[PHASE 1: EXTRACT]")
-    sensor_raw = extract_sensor_data(sensor_file, days_back=days_back)
     quality_raw = extract_quality_data(quality_file)
 
-    if sensor_raw.empty:
-        print("✗ PIPELINE FAILED: No sensor data extracted")
-        return
-
     # PHASE 2: TRANSFORM
     print("\n[PHASE 2: TRANSFORM]")
-    print("Task 2.1: Cleaning sensor data...")
-    sensor_clean = clean_sensor_data(sensor_raw)
+    print("Task 2.1 + 2.2: Extracting, cleaning and standardizing sensor data by batch...")
+    try:
+        sensor_std = _extract_transform_sensor_data(sensor_file, days_back)
+    except Exception as e:
+        print(f"✗ ERROR extracting/transforming sensor data: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        sensor_std = pd.DataFrame()
 
-    print("Task 2.2: Standardizing data...")
-    sensor_std = standardize_data(sensor_clean)
+    if sensor_std.empty:
+        print("✗ PIPELINE FAILED: No sensor data extracted")
+        return
+
+    print("Task 2.2: Standardizing quality data...")
     quality_std = standardize_data(quality_raw) if not quality_raw.empty else quality_raw
 
+    # Détection des colonnes une seule fois, partagée par les étapes suivantes
+    sensor_cols = ColumnMap.from_columns(sensor_std.columns)
+    quality_cols = ColumnMap.from_columns(quality_std.columns)
+
     print("Task 2.3: Joining sensor and quality data...")
-    joined_data = join_sensor_quality_data(sensor_std, quality_std)
+    joined_data = join_sensor_quality_data(sensor_std, quality_std, sensor_cols, quality_cols)
 
     print("Task 2.4: Calculating hourly summaries...")
-    hourly_summary = calculate_hourly_summaries(joined_data)
+    hourly_summary = calculate_hourly_summaries(joined_data, sensor_cols)
 
     # PHASE 3: LOAD
     print("\n[PHASE 3: LOAD]")
@@ -562,10 +1017,13 @@ def run_etl_pipeline(sensor_file, quality_file, db_path='production.db', days_ba
         print(f"  ⚠ Colonnes dupliquées détectées: {duplicates}")
 
     conn = create_database(db_path)
-    load_to_database(joined_data, quality_std, hourly_summary, conn)
+    load_to_database(joined_data, quality_std, hourly_summary, conn, sensor_cols, quality_cols)
 
     conn.close()
 
+    # Copie colonnaire pour les requêtes analytiques (AVG, ORDER BY defect_rate...)
+    export_parquet(sensor_std, hourly_summary, db_path)
+
     print("\n" + "=" * 70)
     print("✓ ETL PIPELINE COMPLETED SUCCESSFULLY")
     print("=" * 70)
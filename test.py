@@ -4,7 +4,19 @@ Script de Test Complet pour ETL Pipeline
 import pandas as pd
 import sqlite3
 import os
+import time
+from contextlib import closing
 from datetime import datetime
+from pathlib import Path
+
+# Réglages de connexion pour un harnais en lecture: cache et tables temporaires en mémoire
+TEST_PRAGMAS = """
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-65536;
+    PRAGMA mmap_size=268435456;
+"""
+REPORT_DATE_FORMAT = '%d/%m/%Y %H:%M:%S'
 
 
 def test_database_integrity(db_path='production.db'):
@@ -13,15 +25,27 @@ def test_database_integrity(db_path='production.db'):
     print("=" * 80)
     print(" TEST COMPLET DE LA BASE DE DONNÉES ETL")
     print("=" * 80)
-    print(f"Date du test: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n")
+    # Horodatage unique, partagé par l'en-tête et le rapport
+    test_date = datetime.now().strftime(REPORT_DATE_FORMAT)
+    print(f"Date du test: {test_date}\n")
 
     if not os.path.exists(db_path):
         print(f" ERREUR: Base de données '{db_path}' introuvable!")
         return False
 
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    # Lecture seule: le test ne modifie jamais la base (ni verrou d'écriture, ni journal)
+    # isolation_level=None: pas de transaction implicite autour des SELECT
+    # cached_statements: toutes les requêtes du test restent préparées dans le cache
+    db_uri = f"{Path(db_path).resolve().as_uri()}?mode=ro&cache=shared"
+    with closing(sqlite3.connect(db_uri, uri=True, isolation_level=None, cached_statements=256)) as conn:
+        cursor = conn.cursor()
+        cursor.arraysize = 1000  # fetchmany() par lots si un résultat grossit
+        cursor.executescript(TEST_PRAGMAS)
+        return _run_integrity_tests(cursor, test_date)
+
 
+def _run_integrity_tests(cursor, test_date):
+    """Exécute les tests 1 à 8 sur une connexion ouverte et exporte le rapport."""
     all_tests_passed = True
 
     # ========================================================================
@@ -30,12 +54,20 @@ def test_database_integrity(db_path='production.db'):
     print("\n[TEST 1] Vérification de l'existence des tables")
     print("-" * 80)
 
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-    tables = [row[0] for row in cursor.fetchall()]
+    # Métadonnées de toutes les tables en une requête, réutilisées par le TEST 3
+    cursor.execute("""
+        SELECT m.name, p.name
+        FROM sqlite_master m
+        JOIN pragma_table_info(m.name) p
+        WHERE m.type = 'table'
+    """)
+    table_columns = {}
+    for table, column in cursor:
+        table_columns.setdefault(table, set()).add(column)
     required_tables = ['sensor_readings', 'quality_checks', 'hourly_summary']
 
     for table in required_tables:
-        if table in tables:
+        if table in table_columns:
             print(f"   Table '{table}' existe")
         else:
             print(f"   Table '{table}' MANQUANTE")
@@ -47,9 +79,16 @@ def test_database_integrity(db_path='production.db'):
     print("\n[TEST 2] Vérification du nombre d'enregistrements")
     print("-" * 80)
 
+    # Les trois comptages en un seul aller-retour SQLite
+    cursor.execute("""
+        SELECT
+            (SELECT COUNT(*) FROM sensor_readings),
+            (SELECT COUNT(*) FROM quality_checks),
+            (SELECT COUNT(*) FROM hourly_summary)
+    """)
+    sensor_count, quality_count, summary_count = cursor.fetchone()
+
     # Test sensor_readings
-    cursor.execute("SELECT COUNT(*) FROM sensor_readings")
-    sensor_count = cursor.fetchone()[0]
     print(f"   sensor_readings: {sensor_count:,} enregistrements")
     if sensor_count == 0:
         print(f"  ️  ATTENTION: Table vide!")
@@ -58,8 +97,6 @@ def test_database_integrity(db_path='production.db'):
         print(f"   Table contient des données")
 
     # Test quality_checks
-    cursor.execute("SELECT COUNT(*) FROM quality_checks")
-    quality_count = cursor.fetchone()[0]
     print(f"   quality_checks: {quality_count:,} enregistrements")
     if quality_count == 0:
         print(f"  ⚠  ATTENTION: Table vide!")
@@ -67,8 +104,6 @@ def test_database_integrity(db_path='production.db'):
         print(f"   Table contient des données")
 
     # Test hourly_summary
-    cursor.execute("SELECT COUNT(*) FROM hourly_summary")
-    summary_count = cursor.fetchone()[0]
     print(f"   hourly_summary: {summary_count:,} enregistrements")
     if summary_count == 0:
         print(f"  ⚠  ATTENTION: Table vide!")
@@ -82,19 +117,24 @@ def test_database_integrity(db_path='production.db'):
     print("\n[TEST 3] Vérification de la structure des tables")
     print("-" * 80)
 
-    # Structure sensor_readings
-    cursor.execute("PRAGMA table_info(sensor_readings)")
-    sensor_columns = [row[1] for row in cursor.fetchall()]
-    expected_sensor_cols = ['record_id', 'timestamp', 'line_id', 'machine_id',
-                            'temperature', 'pressure', 'vibration', 'power', 'data_quality']
-
-    print("  Colonnes de sensor_readings:")
-    for col in expected_sensor_cols:
-        if col in sensor_columns:
-            print(f"     {col}")
-        else:
-            print(f"     {col} MANQUANTE")
-            all_tests_passed = False
+    # Structure de chaque table, vérifiée sur les métadonnées lues au TEST 1 (aucune requête)
+    expected_columns = {
+        'sensor_readings': ['record_id', 'timestamp', 'line_id', 'machine_id',
+                            'temperature', 'pressure', 'vibration', 'power', 'data_quality'],
+        'quality_checks': ['check_id', 'timestamp', 'line_id', 'machine_id', 'result', 'defect_type'],
+        'hourly_summary': ['summary_id', 'hour', 'line_id', 'machine_id',
+                           'total_checks', 'defect_count', 'defect_rate'],
+    }
+
+    for table, expected_cols in expected_columns.items():
+        columns = table_columns.get(table, set())
+        print(f"  Colonnes de {table}:")
+        for col in expected_cols:
+            if col in columns:
+                print(f"     {col}")
+            else:
+                print(f"     {col} MANQUANTE")
+                all_tests_passed = False
 
     # ========================================================================
     # TEST 4: Vérification de l'intégrité des données
@@ -114,31 +154,41 @@ def test_database_integrity(db_path='production.db'):
         print(f"   {null_count} valeurs NULL trouvées dans les colonnes critiques")
         all_tests_passed = False
 
-    # Test des doublons de record_id
+    # Test des doublons de record_id (EXISTS s'arrête au premier doublon)
     cursor.execute("""
-        SELECT COUNT(*) - COUNT(DISTINCT record_id) as duplicates 
-        FROM sensor_readings
+        SELECT EXISTS(
+            SELECT 1 FROM sensor_readings
+            GROUP BY record_id
+            HAVING COUNT(*) > 1
+        )
     """)
-    duplicates = cursor.fetchone()[0]
-    if duplicates == 0:
+    if not cursor.fetchone()[0]:
         print(f"   Pas de doublons de record_id")
     else:
+        # Comptage exact seulement si des doublons existent
+        cursor.execute("""
+            SELECT COUNT(*) - COUNT(DISTINCT record_id) as duplicates 
+            FROM sensor_readings
+        """)
+        duplicates = cursor.fetchone()[0]
         print(f"   {duplicates} doublons de record_id trouvés")
         all_tests_passed = False
 
-    # Test des valeurs de température
+    # Test des valeurs de température (statistiques et contrôle des limites en un passage)
     cursor.execute("""
-        SELECT MIN(temperature), MAX(temperature), AVG(temperature)
+        SELECT MIN(temperature), MAX(temperature), AVG(temperature),
+               SUM(CASE WHEN temperature < 0 OR temperature > 150 THEN 1 ELSE 0 END)
         FROM sensor_readings
         WHERE temperature IS NOT NULL
     """)
     temp_stats = cursor.fetchone()
     if temp_stats[0] is not None:
         print(f"   Température: Min={temp_stats[0]:.2f}°C, Max={temp_stats[1]:.2f}°C, Moy={temp_stats[2]:.2f}°C")
-        if 0 <= temp_stats[0] <= 150 and 0 <= temp_stats[1] <= 150:
+        out_of_range = temp_stats[3]
+        if out_of_range == 0:
             print(f"   Valeurs de température dans les limites (0-150°C)")
         else:
-            print(f"  ⚠  Valeurs de température hors limites détectées")
+            print(f"  ⚠  {out_of_range:,} valeurs de température hors limites détectées")
 
     # ========================================================================
     # TEST 5: Vérification de la qualité des données
@@ -146,18 +196,18 @@ def test_database_integrity(db_path='production.db'):
     print("\n[TEST 5] Vérification de la qualité des données")
     print("-" * 80)
 
+    # Pourcentages calculés par SQLite dans le même passage (somme fenêtrée)
     cursor.execute("""
-        SELECT data_quality, COUNT(*) as count 
+        SELECT data_quality, COUNT(*) as count,
+               COUNT(*) * 100.0 / SUM(COUNT(*)) OVER () as pct
         FROM sensor_readings 
         GROUP BY data_quality
     """)
-    quality_dist = cursor.fetchall()
+    quality_dist = list(cursor)
 
-    total_records = sum(row[1] for row in quality_dist)
     print("  Distribution de la qualité:")
-    for quality, count in quality_dist:
-        percentage = (count / total_records) * 100
-        print(f"    • {quality}: {count:,} ({percentage:.2f}%)")
+    for quality, count, pct in quality_dist:
+        print(f"    • {quality}: {count:,} ({pct:.2f}%)")
 
     # ========================================================================
     # TEST 6: Vérification des agrégations horaires
@@ -197,7 +247,7 @@ def test_database_integrity(db_path='production.db'):
         ORDER BY avg_defect_rate DESC
         LIMIT 5
     """)
-    top_defects = cursor.fetchall()
+    top_defects = list(cursor)
 
     if top_defects:
         print("   Top 5 machines avec le plus de défauts:")
@@ -212,23 +262,32 @@ def test_database_integrity(db_path='production.db'):
     print("-" * 80)
 
     # Test de requête complexe
-    import time
-    start_time = time.time()
+    # Horloge monotone haute résolution
+    start_ns = time.perf_counter_ns()
 
+    # Agrégation de chaque table par machine avant la jointure: la jointure sur
+    # machine_id seul multipliait chaque lecture par les heures de la machine
     cursor.execute("""
-        SELECT 
-            s.machine_id,
-            COUNT(*) as reading_count,
-            AVG(s.temperature) as avg_temp,
-            AVG(h.defect_rate) as avg_defect_rate
-        FROM sensor_readings s
-        LEFT JOIN hourly_summary h ON s.machine_id = h.machine_id
-        GROUP BY s.machine_id
+        WITH s AS (
+            SELECT machine_id,
+                   COUNT(*) as reading_count,
+                   AVG(temperature) as avg_temp
+            FROM sensor_readings
+            GROUP BY machine_id
+        ),
+        h AS (
+            SELECT machine_id, AVG(defect_rate) as avg_defect_rate
+            FROM hourly_summary
+            GROUP BY machine_id
+        )
+        SELECT s.machine_id, s.reading_count, s.avg_temp, h.avg_defect_rate
+        FROM s
+        LEFT JOIN h USING (machine_id)
         LIMIT 10
     """)
     results = cursor.fetchall()
 
-    query_time = (time.time() - start_time) * 1000
+    query_time = (time.perf_counter_ns() - start_ns) / 1_000_000
     print(f"  ⚡ Temps d'exécution de requête complexe: {query_time:.2f}ms")
     if query_time < 1000:
         print(f"   Performance excellente (< 1 seconde)")
@@ -251,10 +310,10 @@ def test_database_integrity(db_path='production.db'):
     print("\n[EXPORT] Génération du rapport de test")
     print("-" * 80)
 
-    report = f"""
+    report = [f"""
 RAPPORT DE TEST ETL PIPELINE
 ============================
-Date: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}
+Date: {test_date}
 
 STATISTIQUES GÉNÉRALES:
 - sensor_readings: {sensor_count:,} enregistrements
@@ -262,29 +321,26 @@ STATISTIQUES GÉNÉRALES:
 - hourly_summary: {summary_count:,} enregistrements
 
 QUALITÉ DES DONNÉES:
-"""
+"""]
 
-    for quality, count in quality_dist:
-        percentage = (count / total_records) * 100
-        report += f"- {quality}: {count:,} ({percentage:.2f}%)\n"
+    # Pourcentages déjà calculés par la requête du TEST 5
+    report.extend(f"- {quality}: {count:,} ({pct:.2f}%)\n" for quality, count, pct in quality_dist)
 
-    report += f"""
+    report.append(f"""
 STATUT: {" SUCCÈS" if all_tests_passed else "⚠  ATTENTION"}
-"""
+""")
 
+    # Morceaux écrits directement, sans concaténation intermédiaire
     with open('test_report.txt', 'w', encoding='utf-8') as f:
-        f.write(report)
+        f.writelines(report)
 
     print(f"   Rapport sauvegardé dans 'test_report.txt'")
 
-    conn.close()
     return all_tests_passed
 
 
-def generate_sample_queries():
-    """Génère un fichier avec des requêtes SQL d'exemple."""
-
-    queries = """
+# Contenu statique, encodé une seule fois au chargement du module
+SAMPLE_QUERIES = """
 -- REQUÊTES SQL D'EXEMPLE POUR L'ANALYSE DES DONNÉES
 -- ==================================================
 
@@ -372,9 +428,13 @@ SELECT
     AVG(total_checks) as avg_checks_per_hour
 FROM hourly_summary;
 """
+SAMPLE_QUERIES_BYTES = SAMPLE_QUERIES.encode('utf-8')
+
 
-    with open('sample_queries.sql', 'w', encoding='utf-8') as f:
-        f.write(queries)
+def generate_sample_queries():
+    """Génère un fichier avec des requêtes SQL d'exemple."""
+    with open('sample_queries.sql', 'wb') as f:
+        f.write(SAMPLE_QUERIES_BYTES)
 
     print("\n" + "=" * 80)
     print("📝 Requêtes SQL d'exemple générées dans 'sample_queries.sql'")